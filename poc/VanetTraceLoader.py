@@ -1,6 +1,7 @@
 from datetime import datetime, timedelta
 from collections import defaultdict
 from dataclasses import dataclass
+from functools import cached_property
 from pathlib import Path
 from typing import Dict, Tuple
 
@@ -23,6 +24,24 @@ class VehicleTrace:
     type: str
     trace: pd.DataFrame  # ts, x, y, angle, speed, lane
 
+    # The columns needed per simulation step as plain arrays, since indexing the DataFrame row by row is slow.
+    # Derived lazily so that traces cached by earlier versions (pickled without these) still work.
+    @cached_property
+    def ts(self) -> np.ndarray:
+        return self.trace['timestep_time'].to_numpy(dtype=np.int64)
+
+    @cached_property
+    def xs(self) -> np.ndarray:
+        return self.trace['vehicle_x'].to_numpy(dtype=np.float64)
+
+    @cached_property
+    def ys(self) -> np.ndarray:
+        return self.trace['vehicle_y'].to_numpy(dtype=np.float64)
+
+    @cached_property
+    def angles(self) -> np.ndarray:
+        return self.trace['vehicle_angle'].to_numpy(dtype=np.float64)
+
 
 def map_trace(df: pd.DataFrame, eval=True) -> Dict[str, VehicleTrace]:
     """
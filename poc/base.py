@@ -1,7 +1,6 @@
+import math
 from dataclasses import dataclass
 
-import numpy as np
-
 
 @dataclass
 class RsuConfig:
@@ -17,6 +16,12 @@ class RsuConfig:
 def distance(pos1, pos2):
     """Calculate the Euclidean distance between two positions."""
 
-    x1, y1 = pos1
-    x2, y2 = pos2
-    return np.sqrt((x1 - x2) ** 2 + (y1 - y2) ** 2)
+    return math.hypot(pos1[0] - pos2[0], pos1[1] - pos2[1])
+
+
+def dist_sq(pos1, pos2):
+    """Calculate the squared Euclidean distance between two positions, for comparisons that do not need the root."""
+
+    dx = pos1[0] - pos2[0]
+    dy = pos1[1] - pos2[1]
+    return dx * dx + dy * dy
@@ -0,0 +1,26 @@
+import numpy as np
+from numba import njit
+
+
+@njit(cache=True, fastmath=True)
+def vehicle_station_relations(veh_xy, veh_cos, veh_sin, station_xy, station_range):
+    """
+    Compute the squared distance, range membership and heading towards each station for all vehicles.
+    The loop is small, so it runs single-threaded: a thread team would cost more than the work and would make
+    forking worker processes unsafe.
+    """
+
+    n_vehicles, n_stations = veh_xy.shape[0], station_xy.shape[0]
+    dist_sq = np.empty((n_vehicles, n_stations), dtype=np.float64)
+    in_range = np.empty((n_vehicles, n_stations), dtype=np.bool_)
+    towards = np.empty((n_vehicles, n_stations), dtype=np.bool_)
+    for i in range(n_vehicles):
+        for j in range(n_stations):
+            dx = station_xy[j, 0] - veh_xy[i, 0]
+            dy = station_xy[j, 1] - veh_xy[i, 1]
+            d = dx * dx + dy * dy
+            dist_sq[i, j] = d
+            in_range[i, j] = d <= station_range[j] * station_range[j]
+            towards[i, j] = dx * veh_cos[i] + dy * veh_sin[i] > 0
+
+    return dist_sq, in_range, towards
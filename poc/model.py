@@ -1,15 +1,19 @@
 import math
 from abc import ABC, abstractmethod
-from typing import Optional, List, Dict
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional, List, Dict, Deque, Tuple
 
 import mesa
 import numpy as np
+import pandas as pd
 from mesa import Agent, Model
 from mesa.space import ContinuousSpace
 
 import VanetTraceLoader as vanetLoader
 from VanetTraceLoader import VehicleTrace
-from base import RsuConfig, distance
+from base import RsuConfig, dist_sq
+from fastmath import vehicle_station_relations
 from scheduler import RandomActivationBySortedType
 
 
@@ -61,26 +65,35 @@ class VehicleAgent(Agent):
             return
 
         # Necessary for determining initial station
-        self.trace_iterator = iter(self.trace.trace.iterrows())
-        first_trace = self.trace.trace.iloc[0]
-        self.angle = first_trace['vehicle_angle']
-        self.pos = (first_trace['vehicle_x'], first_trace['vehicle_y'])
+        self.update_angle(self.trace.angles[0])
+        self.pos = (self.trace.xs[0], self.trace.ys[0])
 
     def do_step(self):
         """
         Perform a single step of the vehicle agent.
         """
 
-        _, state = next(self.trace_iterator)
-        assert state['timestep_time'] == self.trace_i + self.trace.first_ts, "Time step mismatch"
+        i = self.trace_i
+        assert self.trace.ts[i] == i + self.trace.first_ts, "Time step mismatch"
         self.trace_i += 1
 
-        self.pos = (state['vehicle_x'], state['vehicle_y'])
-        self.angle = state['vehicle_angle']
+        self.pos = (self.trace.xs[i], self.trace.ys[i])
+        self.update_angle(self.trace.angles[i])
         self.model.space.move_agent(self, self.pos)
+        self.model.update_vehicle_position(self)
 
         self.offloaded_load = self.load_gen.compute_offloaded_load(self)
 
+    def update_angle(self, angle):
+        """
+        Set the angle of the vehicle and cache its cosine and sine, which are needed for every direction check.
+        """
+
+        self.angle = angle
+        angle_rad = math.radians(angle)
+        self.angle_cos = math.cos(angle_rad)
+        self.angle_sin = math.sin(angle_rad)
+
     def step(self):
         """
         Perform a single step of the vehicle agent.
@@ -97,9 +110,9 @@ class VehicleAgent(Agent):
         """
 
         count = 0
-        nearby_dist = 5
+        nearby_dist_sq = 5 ** 2
         for agent in self.model.schedule.get_agents_by_type(VehicleAgent):
-            if agent != self and distance(agent.pos, self.pos) <= nearby_dist:
+            if agent != self and dist_sq(agent.pos, self.pos) <= nearby_dist_sq:
                 count += 1
 
         return count
@@ -110,7 +123,7 @@ class VehicleAgent(Agent):
         Calculate the distance to the station.
         """
 
-        return distance(self.pos, self.station.pos)
+        return self.station.distance_to(self)
 
     def __repr__(self):
         return f"VehicleAgent{self.unique_id}"
@@ -127,7 +140,8 @@ class VECStationAgent(Agent):
         self.range = range_m
         self.capacity = capacity
         self.neighbors: List[VECStationAgent] = neighbors if neighbors else []
-        self.vehicles: List[VehicleAgent] = []
+        # Insertion-ordered set: O(1) removal while keeping a deterministic iteration order
+        self.vehicles: Dict[VehicleAgent, None] = {}
         self.distance_threshold = 0.7  # Can be removed (except rendering)
         self.load_threshold = 0.95
         self.vehicle_distance = None
@@ -200,8 +214,8 @@ class VECStationAgent(Agent):
         """
 
         assert self != to, "Cannot hand over to the same station"
-        self.vehicles.remove(vehicle)
-        to.vehicles.append(vehicle)
+        del self.vehicles[vehicle]
+        to.vehicles[vehicle] = None
         vehicle.station = to
         self.increment_neighbor_load(to.unique_id, vehicle.offloaded_load)
         to.increment_neighbor_load(self.unique_id, -vehicle.offloaded_load)
@@ -239,7 +253,7 @@ class VECStationAgent(Agent):
 
         if not force:
             # Check if the vehicle is 1. in range and 2. the RSU has enough capacity
-            if distance(self.pos, vehicle.pos) > self.range:
+            if self.distance_sq_to(vehicle) > self.range * self.range:
                 return False
             if self.load + vehicle.offloaded_load > self.capacity:
                 return False
@@ -254,7 +268,47 @@ class VECStationAgent(Agent):
         Check if a vehicle is within the station's range.
         """
 
-        return distance(self.pos, vehicle.pos) <= self.range
+        # noinspection PyTypeChecker
+        model: VECModel = self.model
+        return model.is_vehicle_in_range_of(vehicle, self)
+
+    def is_vehicle_moving_towards(self, vehicle: VehicleAgent):
+        """
+        Check if a vehicle is moving towards the station.
+        """
+
+        # noinspection PyTypeChecker
+        model: VECModel = self.model
+        return model.is_vehicle_moving_towards(vehicle, self)
+
+    def distance_to(self, vehicle: VehicleAgent):
+        """
+        Get the distance between the station and a vehicle from the model's distance matrix.
+        """
+
+        # noinspection PyTypeChecker
+        model: VECModel = self.model
+        return model.vehicle_station_distance(vehicle, self)
+
+    def distance_sq_to(self, vehicle: VehicleAgent):
+        """
+        Get the squared distance between the station and a vehicle, e.g. for range checks and nearest-station lookups.
+        """
+
+        # noinspection PyTypeChecker
+        model: VECModel = self.model
+        return model.vehicle_station_dist_sq(vehicle, self)
+
+
+@dataclass
+class TickEffects:
+    """
+    Relations between all vehicles (rows) and stations (columns) for one tick.
+    """
+
+    dist_sq: np.ndarray
+    in_range: np.ndarray
+    moving_towards: np.ndarray
 
 
 class VECModel(Model):
@@ -262,7 +316,7 @@ class VECModel(Model):
 
     def __init__(self, rs_strategy: RSAgentStrategy, rsu_configs: List[RsuConfig],
                  vehicle_load_gen: VehicleLoadGenerator, traces: Dict[str, VehicleTrace], steps_per_second,
-                 load_update_interval=1, start_at=0, **kwargs):
+                 load_update_interval=1, start_at=0, chart_tail=0, **kwargs):
         # Seed is set via super().new()
         super().__init__()
         self.running = True
@@ -334,6 +388,20 @@ class VECModel(Model):
             self.vec_stations[i].neighbors = [s for s in self.vec_stations if s != self.vec_stations[i]]
             self.vec_stations[i].neighbor_load = {x.unique_id: 0 for x in self.vec_stations[i].neighbors}
 
+        # Positions are kept as arrays (one row per vehicle, one column per station) so that all vehicle-station
+        # distances can be computed at once per tick instead of one distance() call per pair
+        self._station_index: Dict[int, int] = {s.unique_id: i for i, s in enumerate(self.vec_stations)}
+        self._station_xy = np.array([s.pos for s in self.vec_stations], dtype=np.float64)
+        self._station_range = np.array([s.range for s in self.vec_stations], dtype=np.float64)
+        self._veh_index: Dict[int, int] = {}
+        self._veh_xy = np.zeros((len(self.traces), 2), dtype=np.float64)
+        self._veh_cos = np.zeros(len(self.traces), dtype=np.float64)
+        self._veh_sin = np.zeros(len(self.traces), dtype=np.float64)
+        self._veh_rows = 0  # High-water mark of used rows
+        self._free_veh_rows: List[int] = []
+        self._tick_effects: Optional[TickEffects] = None
+        self._dist_matrix: Optional[np.ndarray] = None
+
         self.vehicle_id = 0
         self.shared_load_info = {s.unique_id: 0 for s in self.vec_stations}
 
@@ -344,7 +412,11 @@ class VECModel(Model):
 
         self.step_second = -1
 
-        self.datacollector.collect(self)
+        self._agent_df_cache: Optional[pd.DataFrame] = None
+        # Recent per-station vehicle counts for live charts, so they do not need to rebuild the full history
+        self.count_history: Optional[Deque[Tuple[int, Tuple[int, ...]]]] = \
+            deque(maxlen=chart_tail) if chart_tail > 0 else None
+        self.collect()
 
         for _ in range(start_at):
             self.step()
@@ -360,9 +432,12 @@ class VECModel(Model):
         vehicle.ts = step // (1 / self.steps_per_second)
 
         self.schedule.add(vehicle)
+        self.register_vehicle(vehicle)
 
-        station = min(self.vec_stations, key=lambda x: distance(x.pos, vehicle.pos))
-        station.vehicles.append(vehicle)
+        dx = self._station_xy[:, 0] - vehicle.pos[0]
+        dy = self._station_xy[:, 1] - vehicle.pos[1]
+        station = self.vec_stations[int(np.argmin(dx * dx + dy * dy))]
+        station.vehicles[vehicle] = None
         vehicle.station = station
 
         return vehicle
@@ -374,7 +449,8 @@ class VECModel(Model):
 
         while self.to_remove and self.to_remove[-1].trace.last_ts == self.step_second:
             v = self.to_remove.pop()
-            v.station.vehicles.remove(v)
+            del v.station.vehicles[v]
+            self.unregister_vehicle(v)
             self.schedule.remove(v)
             v.remove()
 
@@ -400,7 +476,7 @@ class VECModel(Model):
             self.schedule.step()
             self.rs_strategy.after_step(self)
 
-        self.datacollector.collect(self)
+        self.collect()
 
         # Reset per-step statistics
         self.report_successful_handovers = 0
@@ -410,6 +486,133 @@ class VECModel(Model):
         if len(self.to_remove) == 0 and len(self.unplaced_vehicles) == 0:
             self.running = False
 
+    def collect(self):
+        """
+        Collect the data of the current step.
+        """
+
+        self.datacollector.collect(self)
+        self._agent_df_cache = None
+        if self.count_history is not None:
+            self.count_history.append((self.steps, tuple(len(s.vehicles) for s in self.vec_stations)))
+
+    def agent_vars_df(self) -> pd.DataFrame:
+        """
+        Get the agent variables collected so far. The DataFrame is built once per step and shared between charts.
+        """
+
+        if self._agent_df_cache is None:
+            self._agent_df_cache = self.datacollector.get_agent_vars_dataframe()
+        return self._agent_df_cache
+
+    def register_vehicle(self, vehicle: VehicleAgent):
+        """
+        Assign a row in the position arrays to a vehicle.
+        """
+
+        if self._free_veh_rows:
+            row = self._free_veh_rows.pop()
+        else:
+            row = self._veh_rows
+            self._veh_rows += 1
+        self._veh_index[vehicle.unique_id] = row
+        self.update_vehicle_position(vehicle)
+
+    def unregister_vehicle(self, vehicle: VehicleAgent):
+        """
+        Release the row of a removed vehicle so it can be reused. The stale values in the row are never looked up
+        and are overwritten when the row is reused, so they stay finite for the fastmath kernel.
+        """
+
+        row = self._veh_index.pop(vehicle.unique_id)
+        self._free_veh_rows.append(row)
+
+    def update_vehicle_position(self, vehicle: VehicleAgent):
+        """
+        Write the current position and heading of a vehicle into the position arrays.
+        """
+
+        row = self._veh_index[vehicle.unique_id]
+        self._veh_xy[row] = vehicle.pos
+        self._veh_cos[row] = vehicle.angle_cos
+        self._veh_sin[row] = vehicle.angle_sin
+        self._tick_effects = None
+        self._dist_matrix = None
+
+    def _compute_tick_effects(self) -> TickEffects:
+        """
+        Compute everything the stations read about vehicle positions in one batched pass over all vehicle-station
+        pairs. Handovers only change assignments, not positions, so the result stays valid until vehicles move again
+        and the strategies can apply their handovers one by one afterward.
+        """
+
+        n = self._veh_rows
+        return TickEffects(*vehicle_station_relations(self._veh_xy[:n], self._veh_cos[:n], self._veh_sin[:n],
+                                                      self._station_xy, self._station_range))
+
+    @property
+    def tick_effects(self) -> TickEffects:
+        """
+        The vehicle-station relations of the current tick, recomputed lazily after vehicles moved.
+        """
+
+        if self._tick_effects is None:
+            self._tick_effects = self._compute_tick_effects()
+        return self._tick_effects
+
+    @property
+    def dist_matrix(self) -> np.ndarray:
+        """
+        Distances between all vehicles (rows) and stations (columns). Only computed if an actual distance is needed.
+        """
+
+        if self._dist_matrix is None:
+            self._dist_matrix = np.sqrt(self.tick_effects.dist_sq)
+        return self._dist_matrix
+
+    def vehicle_station_distance(self, vehicle: VehicleAgent, station: "VECStationAgent"):
+        """
+        Get the distance between a vehicle and a station.
+        """
+
+        return self.dist_matrix[self._veh_index[vehicle.unique_id], self._station_index[station.unique_id]]
+
+    def vehicle_station_dist_sq(self, vehicle: VehicleAgent, station: "VECStationAgent"):
+        """
+        Get the squared distance between a vehicle and a station.
+        """
+
+        return self.tick_effects.dist_sq[self._veh_index[vehicle.unique_id], self._station_index[station.unique_id]]
+
+    def is_vehicle_in_range_of(self, vehicle: VehicleAgent, station: "VECStationAgent") -> bool:
+        """
+        Check if a vehicle is within the range of a station.
+        """
+
+        return self.tick_effects.in_range[self._veh_index[vehicle.unique_id], self._station_index[station.unique_id]]
+
+    def is_vehicle_in_range_of_any(self, vehicle: VehicleAgent) -> bool:
+        """
+        Check if a vehicle is within the range of any station.
+        """
+
+        return self.tick_effects.in_range[self._veh_index[vehicle.unique_id]].any()
+
+    def is_vehicle_moving_towards(self, vehicle: VehicleAgent, station: "VECStationAgent") -> bool:
+        """
+        Check if a vehicle is moving towards a station.
+        """
+
+        return self.tick_effects.moving_towards[
+            self._veh_index[vehicle.unique_id], self._station_index[station.unique_id]]
+
+    def nearest_station(self, vehicle: VehicleAgent) -> "VECStationAgent":
+        """
+        Get the station nearest to a vehicle. On ties, the station created first is returned.
+        """
+
+        return self.vec_stations[int(np.argmin(self.tick_effects.dist_sq[self._veh_index[vehicle.unique_id]]))]
+
     def update_shared_load_info(self):
         """
         Update the shared load information between stations.
@@ -549,7 +752,7 @@ def compute_vehicle_qos(agent: VehicleAgent):
     """
 
     range_factor = 1
-    dist = distance(agent.pos, agent.station.pos)
+    dist = agent.rsu_distance
     if not agent.station.is_vehicle_in_range(agent):
         range_factor = math.exp(-RANGE_QOS_ALPHA * (dist - agent.station.range))
 
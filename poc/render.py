@@ -1,8 +1,8 @@
-import math
-
+import numpy as np
 import solara
+from matplotlib.collections import EllipseCollection, PatchCollection, PolyCollection
 from matplotlib.figure import Figure
-from matplotlib.patches import Rectangle, Circle, FancyArrow
+from matplotlib.patches import Rectangle, Circle
 
 from model import VehicleAgent, VECStationAgent, VECModel
 
@@ -24,20 +24,24 @@ def render_model(model: VECModel, background=None):
     ax = fig.subplots()
 
     ax.imshow(background, cmap='gray')
+    draw_stations(ax, model)
 
-    # Draw all agents
+    # Collect all vehicles first and draw them as a single collection instead of one patch per vehicle
+    positions, colors, labels = [], [], []
     for agent in model.agents:
         if isinstance(agent, VehicleAgent):
-            if hasattr(agent, 'active') and not agent.active:
+            if not agent.active:
                 continue
 
-            ax.add_patch(Circle(agent.pos, 3, facecolor=VEC_STATION_COLORS[agent.station.unique_id], edgecolor='black'))
-            ax.text(agent.pos[0], agent.pos[1], str(agent.unique_id), ha='center', va='center')
-        elif isinstance(agent, VECStationAgent):
-            color = VEC_STATION_COLORS[agent.unique_id]
-            ax.add_patch(Rectangle((agent.pos[0] - 3, agent.pos[1] - 3), 6, 6, facecolor=color))
-            range_circle = Circle(agent.pos, agent.range, color=color, fill=False, linestyle='--')
-            ax.add_patch(range_circle)
+            positions.append(agent.pos)
+            colors.append(_color(agent.station.unique_id))
+            labels.append(str(agent.unique_id))
+
+    if positions:
+        ax.add_collection(EllipseCollection(6, 6, 0, units='xy', offsets=positions, offset_transform=ax.transData,
+                                            facecolors=colors, edgecolors='black'))
+        for pos, label in zip(positions, labels):
+            ax.text(pos[0], pos[1], label, ha='center', va='center')
 
     ax.set_xlim(0, model.width)
     ax.set_ylim(0, model.height)
@@ -52,27 +56,24 @@ def render_model_orientations(model: VECModel):
 
     fig = Figure()
     ax = fig.subplots()
-
-    for agent in model.agents:
-        if isinstance(agent, VehicleAgent):
-            if hasattr(agent, 'active') and not agent.active:
-                continue
-
-            arrow_length = 10
-            angle_rad = math.radians(agent.angle)
-
-            dx = arrow_length * math.cos(angle_rad)
-            dy = arrow_length * math.sin(angle_rad)
-
-            arrow = FancyArrow(agent.pos[0] - dx / 2, agent.pos[1] - dy / 2, dx, dy, head_width=5, head_length=6,
-                               facecolor=VEC_STATION_COLORS[agent.station.unique_id], linewidth=0)
-            ax.add_patch(arrow)
-
-        elif isinstance(agent, VECStationAgent):
-            color = VEC_STATION_COLORS[agent.unique_id]
-            ax.add_patch(Rectangle((agent.pos[0] - 3, agent.pos[1] - 3), 6, 6, facecolor=color))
-            range_circle = Circle(agent.pos, agent.range, color=color, fill=False, linestyle='--')
-            ax.add_patch(range_circle)
+    draw_stations(ax, model)
+
+    # Skip inactive vehicles before any math, then compute all arrows at once
+    vehicles = [agent for agent in model.agents if isinstance(agent, VehicleAgent) and agent.active]
+    if vehicles:
+        arrow_length, head_width, head_length = 10, 5, 6
+        positions = np.array([vehicle.pos for vehicle in vehicles], dtype=np.float64)
+        directions = np.array([(vehicle.angle_cos, vehicle.angle_sin) for vehicle in vehicles])
+        normals = directions[:, ::-1] * (-1, 1)
+        colors = [_color(vehicle.station.unique_id) for vehicle in vehicles]
+
+        # Same glyph as a FancyArrow of arrow_length centered on the vehicle with the head added on top of the length.
+        # Its default shaft is practically invisible, so only the head triangle is drawn.
+        head_bases = positions + directions * (arrow_length / 2)
+        tips = head_bases + directions * head_length
+        heads = np.stack([tips, head_bases + normals * (head_width / 2), head_bases - normals * (head_width / 2)],
+                         axis=1)
+        ax.add_collection(PolyCollection(heads, facecolors=colors, linewidths=0))
 
     ax.set_xlim(0, model.width)
     ax.set_ylim(0, model.height)
@@ -81,6 +82,19 @@ def render_model_orientations(model: VECModel):
     solara.FigureMatplotlib(fig)
 
 
+def draw_stations(ax, model: VECModel):
+    """
+    Draw all VEC stations and their ranges, using one collection for all rectangles and one for all range circles.
+    """
+
+    colors = [_color(station.unique_id) for station in model.vec_stations]
+    rectangles = [Rectangle((station.pos[0] - 3, station.pos[1] - 3), 6, 6) for station in model.vec_stations]
+    range_circles = [Circle(station.pos, station.range) for station in model.vec_stations]
+
+    ax.add_collection(PatchCollection(rectangles, facecolors=colors))
+    ax.add_collection(PatchCollection(range_circles, facecolors='none', edgecolors=colors, linestyles='--'))
+
+
 def render_distance_chart(model: VECModel):
     """
     Render a chart showing the distances of vehicles from VEC stations.
@@ -89,14 +103,11 @@ def render_distance_chart(model: VECModel):
     fig = Figure()
     ax = fig.subplots()
 
-    data = model.datacollector.get_agent_vars_dataframe()['Distances']
+    data = model.agent_vars_df()['Distances']
     filtered_distances = data.loc[data.index.get_level_values('AgentID') >= 10000]
     df = filtered_distances.unstack(level="AgentID")
 
-    stations = {a.unique_id: VEC_STATION_COLORS[a.unique_id] for a in
-                model.schedule.get_agents_by_type(VECStationAgent)}
-    for station_id, color in stations.items():
-        df[station_id].plot(ax=ax, color=color)
+    plot_station_columns(ax, model, df)
 
     ax.set_title('Distances from VEC stations')
     ax.set_xlabel('Step')
@@ -104,6 +115,24 @@ def render_distance_chart(model: VECModel):
     solara.FigureMatplotlib(fig)
 
 
+def plot_station_columns(ax, model: VECModel, df):
+    """
+    Plot one line per VEC station column of the DataFrame in the station's color, using a single plot call.
+    """
+
+    station_ids = [a.unique_id for a in model.schedule.get_agents_by_type(VECStationAgent)]
+    plot_station_lines(ax, station_ids, df.index.values, df[station_ids].values)
+
+
+def plot_station_lines(ax, station_ids, steps, values):
+    """
+    Plot one line per VEC station (columns of values) in the station's color, using a single plot call.
+    """
+
+    ax.set_prop_cycle(color=[_color(station_id) for station_id in station_ids])
+    ax.plot(steps, values)
+
+
 def make_render_station_vehicle_count_chart(tail=0):
     """
     Create a render function that renders a chart showing the vehicle count at VEC stations.
@@ -113,16 +142,20 @@ def make_render_station_vehicle_count_chart(tail=0):
         fig = Figure()
         ax = fig.subplots()
 
-        data = model.datacollector.get_agent_vars_dataframe()['StationVehicleCount']
-        filtered_counts = data.loc[data.index.get_level_values('AgentID') >= 10000]
-        df = filtered_counts.unstack(level="AgentID")
-        if tail > 0:
-            df = df.tail(tail)
-
-        stations = {a.unique_id: VEC_STATION_COLORS[a.unique_id] for a in
-                    model.schedule.get_agents_by_type(VECStationAgent)}
-        for station_id, color in stations.items():
-            df[station_id].plot(ax=ax, color=color)
+        if tail > 0 and model.count_history is not None:
+            # Only the recent counts are shown, which the model keeps without going through the data collector
+            history = list(model.count_history)[-tail:]
+            steps = np.array([step for step, _ in history])
+            counts = np.array([step_counts for _, step_counts in history])
+            plot_station_lines(ax, [s.unique_id for s in model.vec_stations], steps, counts)
+        else:
+            data = model.agent_vars_df()['StationVehicleCount']
+            filtered_counts = data.loc[data.index.get_level_values('AgentID') >= 10000]
+            df = filtered_counts.unstack(level="AgentID")
+            if tail > 0:
+                df = df.tail(tail)
+
+            plot_station_columns(ax, model, df)
 
         ax.set_title('Vehicle count at VEC stations')
         ax.set_xlabel('Step')
@@ -141,16 +174,13 @@ def make_render_station_load_chart(tail=0):
         fig = Figure()
         ax = fig.subplots()
 
-        data = model.datacollector.get_agent_vars_dataframe()['StationVehicleLoad']
+        data = model.agent_vars_df()['StationVehicleLoad']
         filtered_counts = data.loc[data.index.get_level_values('AgentID') >= 10000]
         df = filtered_counts.unstack(level="AgentID")
         if tail > 0:
             df = df.tail(tail)
 
-        stations = {a.unique_id: VEC_STATION_COLORS[a.unique_id] for a in
-                    model.schedule.get_agents_by_type(VECStationAgent)}
-        for station_id, color in stations.items():
-            df[station_id].plot(ax=ax, color=color)
+        plot_station_columns(ax, model, df)
 
         ax.axhline(y=1, color='gray', linestyle='--')
 
@@ -170,13 +200,13 @@ def render_vehicle_loads(model: VECModel):
     fig = Figure()
     ax = fig.subplots()
 
-    data = model.datacollector.get_agent_vars_dataframe()['VehicleLoad']
+    data = model.agent_vars_df()['VehicleLoad']
     filtered_loads = data.loc[data.index.get_level_values('AgentID') < 10000]
 
     last_step_loads = filtered_loads.unstack(level="AgentID").tail(1).T
     last_step_loads = last_step_loads.dropna()
     vehicle_dict = {agent.unique_id: agent for agent in model.schedule.get_agents_by_type(VehicleAgent)}
-    colors = [VEC_STATION_COLORS[vehicle_dict[vehicle_id].station.unique_id] for vehicle_id in last_step_loads.index]
+    colors = [_color(vehicle_dict[vehicle_id].station.unique_id) for vehicle_id in last_step_loads.index]
     ax.bar(last_step_loads.index, last_step_loads.values.flatten(), color=colors)
 
     ax.set_title('Vehicle loads')
@@ -197,3 +227,14 @@ VEC_STATION_COLORS = {
     10008: "brown",
     10009: "cyan"
 }
+
+# Station IDs are dense from 10001, so per-agent lookups can index a list instead of hashing into the dict
+_STATION_COLOR_LIST = [VEC_STATION_COLORS[10001 + i] for i in range(len(VEC_STATION_COLORS))]
+
+
+def _color(station_id):
+    """
+    Get the color of a VEC station.
+    """
+
+    return _STATION_COLOR_LIST[station_id - 10001]
@@ -77,9 +77,8 @@ def run_model(params, max_steps=None):
     step = 0
     while model.running and (max_steps is None or step <= max_steps):
         start_time = time.monotonic()
-        # something
         model.step()
-        print(f"Run time {time.monotonic() - start_time} seconds")
+        logging.debug("Step %s run time %s seconds", step, time.monotonic() - start_time)
 
         step += 1
 
@@ -2,10 +2,10 @@ import itertools
 import logging
 import math
 from collections import defaultdict, deque
+from typing import Callable, List, Optional
 import numpy as np
 
 import units as units
-from base import distance
 from model import VehicleLoadGenerator, VehicleAgent, RSAgentStrategy, VECStationAgent, VECModel
 
 from td3_torch import Agent as TD3Agent
@@ -49,7 +49,7 @@ class ARHCStrategy(RSAgentStrategy):
         If the suitability is below the leaving threshold, the handover is forced.
         """
 
-        for vehicle in list(station.vehicles):
+        for vehicle in tuple(station.vehicles):
             # Based on trajectory suitability, decide if the vehicle should be handed over
             trajectory_suitability = calculate_trajectory_suitability(station, vehicle)
             if trajectory_suitability <= self.leaving_threshold:
@@ -96,8 +96,8 @@ class ARHCStrategy(RSAgentStrategy):
                 current.report_failed_handover()
                 continue
 
-            logging.info(
-                f"Vehicle {vehicle.unique_id} is being handed over to VEC station {neighbor_station.unique_id} to balance load")
+            logging.info("Vehicle %s is being handed over to VEC station %s to balance load", vehicle.unique_id,
+                         neighbor_station.unique_id)
             current.perform_handover(neighbor_station, vehicle, "overload" if is_overload else "load_balancing")
 
             # Recursive call to perform potentially multiple load-balancing related handovers
@@ -112,18 +112,18 @@ class ARHCStrategy(RSAgentStrategy):
         neighbors_with_score = [
             (x, calculate_station_suitability(x, station.get_neighbor_load(x.unique_id), vehicle))
             for x in station.neighbors if
-            distance(x.pos, vehicle.pos) < x.range]
+            x.distance_sq_to(vehicle) < x.range * x.range]
         neighbors_with_score.sort(key=lambda x: x[1], reverse=True)
 
         if len(neighbors_with_score) == 0:
             if force:
-                logging.warning(f"Vehicle {vehicle.unique_id} is leaving coverage area!!")
+                logging.warning("Vehicle %s is leaving coverage area!!", vehicle.unique_id)
             return False
 
-        logging.debug(f"Neighbors with score for vehicle {vehicle.unique_id}: %s", neighbors_with_score)
+        logging.debug("Neighbors with score for vehicle %s: %s", vehicle.unique_id, neighbors_with_score)
 
         if neighbors_with_score[0][1] == 0 and not force:
-            logging.warning(f"Vehicle {vehicle.unique_id} cannot be handed over to any neighbor (no force)")
+            logging.warning("Vehicle %s cannot be handed over to any neighbor (no force)", vehicle.unique_id)
             return False
 
         # Loop through sorted neighbors and handover to the first one that accepts
@@ -134,7 +134,7 @@ class ARHCStrategy(RSAgentStrategy):
                 continue
 
             station.perform_handover(neighbor, vehicle, cause)
-            logging.info(f"Vehicle {vehicle.unique_id} handed over to VEC station {neighbor.unique_id}")
+            logging.info("Vehicle %s handed over to VEC station %s", vehicle.unique_id, neighbor.unique_id)
 
             return True
 
@@ -149,21 +149,20 @@ class NearestRSUStrategy(RSAgentStrategy):
     def handle_offloading(self, station: VECStationAgent):
         # A vehicle should always be connected to the nearest RSU
         # Check for all vehicles that the nearest RSU is the current, otherwise hand over to nearest
-        for vehicle in list(station.vehicles):
-            nearest_station = min(station.neighbors, key=lambda x: distance(x.pos, vehicle.pos))
-            if distance(nearest_station.pos, vehicle.pos) < distance(station.pos, vehicle.pos):
-                logging.info(
-                    f"Vehicle {vehicle.unique_id} is being handed over to the nearest station {nearest_station.unique_id}")
+        for vehicle in tuple(station.vehicles):
+            nearest_station = min(station.neighbors, key=lambda x: x.distance_sq_to(vehicle))
+            if nearest_station.distance_sq_to(vehicle) < station.distance_sq_to(vehicle):
+                logging.info("Vehicle %s is being handed over to the nearest station %s", vehicle.unique_id,
+                             nearest_station.unique_id)
                 station.perform_handover(nearest_station, vehicle)
 
     def after_step(self, model: VECModel):
         # Assert that every vehicle is connected to the nearest station
         vehicles = model.schedule.get_agents_by_type(VehicleAgent)
-        stations = model.vec_stations
 
         for vehicle in vehicles:
-            nearest_station = min(stations, key=lambda x: distance(x.pos, vehicle.pos))
-            assert distance(nearest_station.pos, vehicle.pos) == distance(vehicle.station.pos, vehicle.pos), \
+            nearest_station = model.nearest_station(vehicle)
+            assert nearest_station.distance_sq_to(vehicle) == vehicle.station.distance_sq_to(vehicle), \
                 f"Vehicle {vehicle.unique_id} is not connected to the nearest station"
 
 
@@ -177,26 +176,25 @@ class LatestPossibleHandoverStrategy(RSAgentStrategy):
         # We know that all vehicles move before the RSU handover phase
         # Therefore, we only need to check if some vehicles are out of the range of the RSU
         # If so, perform handover to the nearest other RSU
-        for vehicle in list(station.vehicles):
-            if vehicle.rsu_distance > station.range:
-                in_range_stations = [s for s in station.neighbors if s.is_vehicle_in_range(vehicle)]
-                if not in_range_stations:
-                    logging.warning(f"Vehicle {vehicle.unique_id} is out of range of all RSUs")
+        for vehicle in tuple(station.vehicles):
+            if not station.is_vehicle_in_range(vehicle):
+                nearest_station = find_nearest_station_in_range(station.neighbors, vehicle)
+                if nearest_station is None:
+                    logging.warning("Vehicle %s is out of range of all RSUs", vehicle.unique_id)
                     continue
 
-                nearest_station = min(in_range_stations, key=lambda x: distance(x.pos, vehicle.pos))
                 if nearest_station == station:
-                    logging.warning(f"Vehicle {vehicle.unique_id} is out of range of all RSUs")
+                    logging.warning("Vehicle %s is out of range of all RSUs", vehicle.unique_id)
                     continue
-                logging.info(
-                    f"Vehicle {vehicle.unique_id} is being handed over to the nearest station {nearest_station.unique_id}")
+                logging.info("Vehicle %s is being handed over to the nearest station %s", vehicle.unique_id,
+                             nearest_station.unique_id)
                 station.perform_handover(nearest_station, vehicle)
 
     def after_step(self, model: "VECModel"):
         # Check that each vehicle is in range of its station
         for vehicle in model.schedule.get_agents_by_type(VehicleAgent):
             assert (vehicle.station.is_vehicle_in_range(vehicle)
-                    or not [s for s in model.vec_stations if s.is_vehicle_in_range(vehicle)]), \
+                    or not model.is_vehicle_in_range_of_any(vehicle)), \
                 f"Vehicle {vehicle.unique_id} is out of range"
 
 
@@ -214,33 +212,29 @@ class EarliestPossibleHandoverStrategy(RSAgentStrategy):
     def handle_offloading(self, station: VECStationAgent):
         # For each vehicle, check if another RSU is in range which wasn't previously connected
         # If so, perform handover to closest
-        for vehicle in list(station.vehicles):
-            # Filter stations that are in range
-            in_range_stations = [x for x in station.neighbors
-                                 if x.unique_id not in self.previously_connected[vehicle.unique_id]
-                                 and distance(x.pos, vehicle.pos) <= x.range
-                                 and is_moving_towards(vehicle.pos, vehicle.angle, x.pos)]
+        for vehicle in tuple(station.vehicles):
+            # Get the closest station in range that wasn't previously connected
+            previous = self.previously_connected[vehicle.unique_id]
+            nearest_station = find_nearest_station_in_range(
+                station.neighbors, vehicle,
+                lambda x: x.unique_id not in previous and x.is_vehicle_moving_towards(vehicle))
 
             #print(f"Station: {station}")
             #print(f"Station Neigbhors: {station.neighbors}")
 
-            if not in_range_stations:
+            if nearest_station is None:
                 if station.is_vehicle_in_range(vehicle):
                     continue
 
                 # Special case: All stations in range are in previous connections
-                in_range_stations = [x for x in station.neighbors
-                                     if distance(x.pos, vehicle.pos) <= x.range]
+                nearest_station = find_nearest_station_in_range(station.neighbors, vehicle)
 
-                if not in_range_stations:
-                    logging.warning(f"Vehicle {vehicle.unique_id} is out of range of all RSUs")
+                if nearest_station is None:
+                    logging.warning("Vehicle %s is out of range of all RSUs", vehicle.unique_id)
                     continue
 
-            # Get the closest station that wasn't previously connected
-            nearest_station = min(in_range_stations, key=lambda x: distance(x.pos, vehicle.pos))
-
-            logging.info(
-                f"Vehicle {vehicle.unique_id} is being handed over to the nearest station {nearest_station.unique_id}")
+            logging.info("Vehicle %s is being handed over to the nearest station %s", vehicle.unique_id,
+                         nearest_station.unique_id)
             station.perform_handover(nearest_station, vehicle)
             self.previously_connected[vehicle.unique_id].append(station.unique_id)
 
@@ -248,7 +242,7 @@ class EarliestPossibleHandoverStrategy(RSAgentStrategy):
         # Check that each vehicle is in range of its station
         for vehicle in model.schedule.get_agents_by_type(VehicleAgent):
             assert (vehicle.station.is_vehicle_in_range(vehicle)
-                    or not [s for s in model.vec_stations if s.is_vehicle_in_range(vehicle)]), \
+                    or not model.is_vehicle_in_range_of_any(vehicle)), \
                 f"Vehicle {vehicle.unique_id} is out of range"
 
 
@@ -288,7 +282,7 @@ class RLHandoverStrategy(RSAgentStrategy):
         last_vehicles_ids = []
         last_actions = []
         last_observations = []
-        for vehicle in list(station.vehicles):
+        for vehicle in tuple(station.vehicles):
             last_vehicles_ids.append(vehicle.unique_id)
             vehicle_trajectory_suitability = [calculate_trajectory_suitability(neighbor_station, vehicle) for neighbor_station
                                               in station.neighbors]
@@ -395,7 +389,7 @@ class RLHandoverStrategy(RSAgentStrategy):
 
         self.step_counter += 1
         perc_done = (self.step_counter / 5402) * 100
-        print(f"% Done {perc_done}")
+        logging.debug("%% Done %s", perc_done)
 
 
 
@@ -426,25 +420,21 @@ class DynamicVehicleLoadGenerator(VehicleLoadGenerator):
         return self.load_per_vehicle[vehicle.unique_id] - self.local_computation
 
 
-def is_moving_towards(vehicle_pos, vehicle_orientation, station_pos):
+def find_nearest_station_in_range(stations: List[VECStationAgent], vehicle: VehicleAgent,
+                                  predicate: Optional[Callable[[VECStationAgent], bool]] = None):
     """
-    Check if a vehicle is moving towards a station.
+    Find the nearest station that has the vehicle in range and satisfies the optional predicate.
+    Scans the stations once instead of building a filtered list and taking its minimum. Returns None if there is none.
     """
 
-    # Convert vehicle orientation to radians for math functions
-    rad = math.radians(vehicle_orientation)
-
-    # Calculate direction vector of vehicle's movement
-    vehicle_dir = (math.cos(rad), math.sin(rad))
-
-    # Calculate vector from vehicle to station
-    to_station_vec = (station_pos[0] - vehicle_pos[0], station_pos[1] - vehicle_pos[1])
-
-    # Calculate dot product
-    dot_product = vehicle_dir[0] * to_station_vec[0] + vehicle_dir[1] * to_station_vec[1]
+    nearest, nearest_dist_sq = None, math.inf
+    for station in stations:
+        dist_sq = station.distance_sq_to(vehicle)
+        if dist_sq < nearest_dist_sq and station.is_vehicle_in_range(vehicle) \
+                and (predicate is None or predicate(station)):
+            nearest, nearest_dist_sq = station, dist_sq
 
-    # Check if dot product is positive
-    return dot_product > 0
+    return nearest
 
 
 def calculate_trajectory_suitability(station: "VECStationAgent", vehicle: VehicleAgent):
@@ -462,7 +452,7 @@ def calculate_trajectory_suitability(station: "VECStationAgent", vehicle: Vehicl
 
     angle_at_vehicle = bearing_rad - vehicle_angle_rad
 
-    result = 1 - (0.5 * math.cos(angle_at_vehicle) + 0.75) / 1.25 * distance(station.pos, vehicle.pos) / station.range
+    result = 1 - (0.5 * math.cos(angle_at_vehicle) + 0.75) / 1.25 * station.distance_to(vehicle) / station.range
 
     assert 0 <= result <= 1, f"Handover metric is out of bounds: {result}"
     return result
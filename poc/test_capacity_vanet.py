@@ -1,10 +1,24 @@
 import math
 import unittest
 
+import numpy as np
+import pandas as pd
 from mesa import Model
 
-from strategies import StaticVehicleLoadGenerator, ARHCStrategy, is_moving_towards
+from base import RsuConfig, distance
+from fastmath import vehicle_station_relations
+from strategies import StaticVehicleLoadGenerator, ARHCStrategy, NearestRSUStrategy
 from model import VehicleAgent, VECStationAgent, VECModel
+from VanetTraceLoader import VehicleTrace
+
+
+def is_moving_towards(vehicle_pos, vehicle_orientation, station_pos):
+    # Same heading conversion as VehicleAgent, evaluated by the kernel the model uses
+    rad = math.radians(vehicle_orientation)
+    _, _, towards = vehicle_station_relations(np.array([vehicle_pos], dtype=np.float64),
+                                              np.array([math.cos(rad)]), np.array([math.sin(rad)]),
+                                              np.array([station_pos], dtype=np.float64), np.array([1.0]))
+    return bool(towards[0, 0])
 
 
 class TestIsMovingTowards(unittest.TestCase):
@@ -58,3 +72,70 @@ class TestVECStationAgent(unittest.TestCase):
         self.assertAlmostEqual(station.calculate_vehicle_station_bearing(vehicle), -math.pi / 2)
         vehicle.pos = (15, 5)
         self.assertAlmostEqual(station.calculate_vehicle_station_bearing(vehicle), -math.pi / 4)
+
+
+class TestVehiclePositionArrays(unittest.TestCase):
+    @staticmethod
+    def make_trace(vehicle_id, first_ts, positions):
+        ts = list(range(first_ts, first_ts + len(positions)))
+        trace = pd.DataFrame({'timestep_time': ts, 'vehicle_x': [p[0] for p in positions],
+                              'vehicle_y': [p[1] for p in positions], 'vehicle_angle': [0.0] * len(positions)})
+        return VehicleTrace(vehicle_id, ts[0], ts[-1], 'car', trace)
+
+    def assert_matches_scalar_distances(self, model: VECModel):
+        for vehicle in model.schedule.get_agents_by_type(VehicleAgent):
+            for station in model.vec_stations:
+                expected = distance(station.pos, vehicle.pos)
+                self.assertAlmostEqual(station.distance_to(vehicle), expected)
+                self.assertEqual(station.is_vehicle_in_range(vehicle), expected <= station.range)
+            self.assertIs(model.nearest_station(vehicle),
+                          min(model.vec_stations, key=lambda x: distance(x.pos, vehicle.pos)))
+
+    def make_model(self):
+        # Vehicle "a" leaves before "b" arrives, so "b" reuses the position of "a" in the model
+        traces = {
+            'a': self.make_trace('a', 0, [(60, 50), (70, 50)]),
+            'c': self.make_trace('c', 0, [(20, 40), (45, 40), (70, 40), (95, 40), (120, 40)]),
+            'b': self.make_trace('b', 2, [(140, 60), (125, 60), (105, 60)]),
+        }
+        rsu_configs = [RsuConfig((50, 50), 40, 100), RsuConfig((150, 50), 40, 100)]
+        return VECModel(NearestRSUStrategy(), rsu_configs, StaticVehicleLoadGenerator(), traces, 1)
+
+    def test_reused_row_matches_scalar_distances(self):
+        model = self.make_model()
+
+        model.step()
+        self.assert_matches_scalar_distances(model)
+
+        model.step()
+        self.assert_matches_scalar_distances(model)
+
+        model.step()
+        vehicles = {v.trace.id: v for v in model.schedule.get_agents_by_type(VehicleAgent)}
+        self.assertNotIn('a', vehicles)
+        self.assertIn('b', vehicles)
+        self.assert_matches_scalar_distances(model)
+
+        while model.running:
+            model.step()
+            self.assert_matches_scalar_distances(model)
+
+    def test_moved_vehicle_updates_distances(self):
+        model = self.make_model()
+        model.step()
+        self.assert_matches_scalar_distances(model)
+
+        vehicle = next(v for v in model.schedule.get_agents_by_type(VehicleAgent) if v.trace.id == 'c')
+        vehicle.pos = (140, 50)
+        model.update_vehicle_position(vehicle)
+        self.assert_matches_scalar_distances(model)
+        self.assertIs(model.nearest_station(vehicle), model.vec_stations[1])
+
+    def test_agent_vars_refreshed_after_collect(self):
+        model = self.make_model()
+        model.step()
+        df = model.agent_vars_df()
+        self.assertIs(model.agent_vars_df(), df)
+
+        model.step()
+        self.assertGreater(len(model.agent_vars_df()), len(df))
@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from visualize_results import running_mean, _load_results
+
+
+class TestRunningMean(unittest.TestCase):
+    def assert_matches_rolling_mean(self, values, window):
+        expected = pd.Series(values).rolling(window, min_periods=1).mean().to_numpy()
+        np.testing.assert_allclose(running_mean(values, window), expected, rtol=1e-6)
+
+    def test_window_smaller_than_length(self):
+        values = np.random.default_rng(0).random(100, dtype=np.float32)
+        self.assert_matches_rolling_mean(values, 7)
+
+    def test_window_equal_to_length(self):
+        values = np.random.default_rng(1).random(20, dtype=np.float32)
+        self.assert_matches_rolling_mean(values, 20)
+
+    def test_window_larger_than_length(self):
+        values = np.random.default_rng(2).random(5, dtype=np.float32)
+        self.assert_matches_rolling_mean(values, 50)
+
+
+class TestLoadResults(unittest.TestCase):
+    def setUp(self):
+        # The results are read relative to the working directory, from ../results
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(self.tmp_dir.name, 'results'))
+        os.makedirs(os.path.join(self.tmp_dir.name, 'utils'))
+        self.old_cwd = os.getcwd()
+        os.chdir(os.path.join(self.tmp_dir.name, 'utils'))
+
+        pd.DataFrame({
+            'Model': ['NearestRSU', 'ARHC-01s', 'EarliestHO', 'ARHC-Oracle'],
+            'HO_Total': [40, 10, 30, 20],
+            'HO_Range': [4, 1, 3, 2],
+            'HO_LB': [0, 9, 27, 18],
+            'HO_Overload': [36, 0, 0, 0],
+            'HO_Failed': [0, 0, 0, 0],
+            'AvgQoSMean': [0.7, 0.9, 0.8, 1.0],
+            'AvgQoSStd': [0.1, 0.1, 0.1, 0.0],
+            'MinQoSMean': [0.5, 0.8, 0.6, 1.0],
+            'GiniMean': [0.4, 0.1, 0.3, 0.2],
+        }).to_csv('../results/results_test.csv', index=False)
+
+    def tearDown(self):
+        os.chdir(self.old_cwd)
+        self.tmp_dir.cleanup()
+
+    def test_models_ordered_with_oracle_first(self):
+        df = _load_results('results_test')
+        self.assertEqual(list(df['Model']), ['ARHC-Oracle', 'ARHC-01s', 'EarliestHO', 'NearestRSU'])
+        self.assertEqual(list(df['HO_Total']), [20, 10, 30, 40])
+        self.assertEqual(df.attrs['arhc_len'], 2)
+
+    def test_cached_frame_not_changed_by_callers(self):
+        df = _load_results('results_test')
+        df['HO_Total'] = -1
+        df.attrs['arhc_len'] = 0
+
+        df = _load_results('results_test')
+        self.assertEqual(list(df['HO_Total']), [20, 10, 30, 40])
+        self.assertEqual(df.attrs['arhc_len'], 2)
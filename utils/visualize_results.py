@@ -1,24 +1,52 @@
+import gc
+import os
+import tempfile
+import warnings
 from collections import defaultdict
-from datetime import datetime, timedelta
-from enum import IntFlag
-from xml.dom import DOMException
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import lru_cache
 
+import matplotlib
+import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 import unidecode
+from numba import njit
 from matplotlib.patches import Rectangle, Circle
 from matplotlib.ticker import PercentFormatter
 
-from poc.VanetTraceLoader import get_grid
-from poc.render import VEC_STATION_COLORS
-from poc.scenarios import CRETEIL_4_RSU_FULL_CAPA_CONFIG, CRETEIL_9_RSU_FULL_CAPA_CONFIG, \
-    CRETEIL_3_FAIL_RSU_FULL_CAPA_CONFIG
 from poc.base import RsuConfig
 
+try:
+    import pyarrow  # Used by pandas for CSV parsing and Parquet files
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# Plots are only written to files, unless VISUALIZE_INTERACTIVE=1 is set to also show them in a window
+INTERACTIVE = os.environ.get('VISUALIZE_INTERACTIVE', '0') == '1'
+
+# Colormaps shared by all plots
+_TAB10 = plt.get_cmap('tab10', 10)
+_TAB20 = plt.get_cmap('tab20', 20)
+_SET1_6 = plt.get_cmap('Set1', 6)
+
+
+def _pct_formatter():
+    # A formatter is bound to the axis it is set on, so every axis needs its own instance
+    return PercentFormatter(1, decimals=0)
+
+
+def show_or_close(fig):
+    if INTERACTIVE:
+        plt.show()
+    else:
+        plt.close(fig)
+
 
 def plot_distribution(models, means, stds, title, ylabel):
-    plt.figure(figsize=(10, 5))
+    fig = plt.figure(figsize=(10, 5))
     colors = plt.get_cmap('tab10', len(models))
     for i, (model, mean, std) in enumerate(zip(models, means, stds)):
         x = np.linspace(max(0, mean - 3 * std), min(1, mean + 3 * std, 100))
@@ -30,7 +58,7 @@ def plot_distribution(models, means, stds, title, ylabel):
     plt.legend(title="Models")
     plt.grid(True, linestyle='--', alpha=0.7)
     plt.tight_layout()
-    plt.show()
+    show_or_close(fig)
 
 
 def custom_sort_key(model_name):
@@ -39,11 +67,118 @@ def custom_sort_key(model_name):
     return 1, model_name
 
 
+# Columns used from the results files and the per-run model variable files, with their types
+RESULTS_COLS = {
+    'Model': 'string',
+    'HO_Total': 'int32',
+    'HO_Range': 'int32',
+    'HO_LB': 'int32',
+    'HO_Overload': 'int32',
+    'HO_Failed': 'int32',
+    'AvgQoSMean': 'float32',
+    'MinQoSMean': 'float32',
+    'GiniMean': 'float32',
+}
+
+RUN_COLS = {
+    'VehicleCount': 'int32',
+    'AvgQoS': 'float32',
+    'MinQoS': 'float32',
+    'AvgQoS_LoadBased': 'float32',
+    'MinQoS_LoadBased': 'float32',
+    'AvgQoS_RangeBased': 'float32',
+    'MinQoS_RangeBased': 'float32',
+    'GiniLoad': 'float32',
+}
+
+
+@lru_cache(maxsize=32)
+def _read_results(path, mtime):
+    # The modification time is only part of the cache key, so that changed files are read again
+    df = pd.read_csv(path, usecols=list(RESULTS_COLS), dtype=RESULTS_COLS)
+    # Order the models once as categories, so sorting does not call the sort key for every row
+    model_order = sorted(df['Model'].unique(), key=custom_sort_key)
+    df['Model'] = df['Model'].astype(pd.CategoricalDtype(model_order, ordered=True))
+    df = df.sort_values(by='Model')
+    # The ARHC models are sorted first, so the plots can split the groups by position
+    df.attrs['arhc_len'] = int(df['Model'].str.startswith('ARHC').sum())
+    return df
+
+
+def _read_run_csv(path):
+    return pd.read_csv(path, usecols=list(RUN_COLS), dtype=RUN_COLS, engine='pyarrow' if HAS_PYARROW else 'c')
+
+
+# Enough for all runs of one plot (up to 5 configurations with 7 models each), while keeping the memory bounded
+@lru_cache(maxsize=64)
+def _read_run(path, mtime):
+    if not HAS_PYARROW:
+        return _read_run_csv(path)
+
+    # Convert to Parquet once, so later runs of this script do not have to parse the CSV again
+    parquet_path = os.path.splitext(path)[0] + '.parquet'
+    if os.path.exists(parquet_path) and os.path.getmtime(parquet_path) >= mtime:
+        try:
+            return pd.read_parquet(parquet_path, columns=list(RUN_COLS))
+        except (OSError, pyarrow.ArrowInvalid) as e:
+            warnings.warn(f"Converting {path} again, could not read {parquet_path}: {e}")
+
+    df = _read_run_csv(path)
+    _write_parquet(df, parquet_path)
+    return df
+
+
+def _write_parquet(df, parquet_path):
+    # Write to a temporary file first, so an interrupted write never leaves a truncated file at the final path
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(parquet_path), prefix='.tmp-', suffix='.parquet')
+    os.close(fd)
+    try:
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, parquet_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _load_results(filename):
+    path = f"../results/{filename}.csv"
+    # The cached frame is shared between calls, so callers get a copy they are free to change
+    return _read_results(path, os.path.getmtime(path)).copy()
+
+
+def _load_run_df(filename, model):
+    path = f"../results/runs/{filename.replace('results', 'result')}_{model.lower()}_model_vars.csv"
+    return _read_run(path, os.path.getmtime(path))
+
+
+def _load_run(filename, model, field):
+    # Ignore first and last due to outliers (no vehicles)
+    values = _load_run_df(filename, model)[field].to_numpy(dtype=np.float32, copy=False)[1:-1]
+    # The array may be a view of the cached frame, so callers must not be able to change it
+    values.flags.writeable = False
+    return values
+
+
+def _load_all_results(configs):
+    # Parsing releases the GIL, so the files are read in parallel
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        dfs = list(executor.map(_load_results, [filename for filename, _ in configs]))
+    return [(filename, df, res_title) for (filename, res_title), df in zip(configs, dfs)]
+
+
+def _is_boxplot_model(model):
+    return not model.startswith('ARHC-') or model in ['ARHC-Oracle', 'ARHC-10s', 'ARHC-20s']
+
+
+def _preload_runs(data):
+    # Fill the run cache in parallel for all runs shown in the boxplots
+    runs = [(filename, model) for filename, df, _ in data for model in df['Model'].unique() if _is_boxplot_model(model)]
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda run: _load_run_df(*run), runs))
+
+
 def visualize_results(configs, experiment_title, plot_ho=True):
-    configs = [(filename,
-                pd.read_csv(f"../results/{filename}.csv").sort_values(by='Model', key=lambda x: x.map(custom_sort_key)),
-                res_title)
-               for filename, res_title in configs]
+    configs = _load_all_results(configs)
 
     if plot_ho:
         for filename, df, res_title in configs:
@@ -59,19 +194,20 @@ def visualize_results(configs, experiment_title, plot_ho=True):
 
 
 def plot_metric(experiment, configs, metric_col, title, ylabel, percentage=False, is_gini=False):
-    plt.figure(figsize=(10, 5))
+    fig = plt.figure(figsize=(10, 5))
 
-    colors = plt.get_cmap('tab10', 10)  # Get a colormap with at least 10 colors
+    colors = _TAB10  # Colormap with at least 10 colors
     baseline_values = {}
     for i, (filename, df, res_title) in enumerate(configs):
         models = df['Model']
         metric_mean = df[metric_col]
 
-        first_group = models[models.str.startswith('ARHC')]
-        first_group_metric = metric_mean[:len(first_group)]
+        arhc_len = df.attrs['arhc_len']
+        first_group = models.iloc[:arhc_len]
+        first_group_metric = metric_mean.iloc[:arhc_len]
 
-        last_group = models[len(first_group):]
-        last_group_metric = metric_mean[len(first_group):]
+        last_group = models.iloc[arhc_len:]
+        last_group_metric = metric_mean.iloc[arhc_len:]
 
         plt.plot(first_group, first_group_metric, label=f"ARHC - {res_title}", marker='o', color=colors(i))
 
@@ -93,7 +229,7 @@ def plot_metric(experiment, configs, metric_col, title, ylabel, percentage=False
     plt.xlabel('Handover Coordination Strategy')
     plt.ylabel(ylabel)
     if percentage:
-        plt.gca().yaxis.set_major_formatter(plt.FuncFormatter(lambda x, _: f'{x:.0%}'))
+        plt.gca().yaxis.set_major_formatter(_pct_formatter())
     plt.legend(title="Strategies & Configurations", loc=legend_loc)
     plt.grid(True, linestyle='--', alpha=0.7)
     plt.xticks(rotation=45, ha='right')
@@ -101,7 +237,7 @@ def plot_metric(experiment, configs, metric_col, title, ylabel, percentage=False
 
     filename = f'results_{unidecode.unidecode(experiment).strip().lower().replace(" ", "_")}_{metric_col.lower().replace(" ", "_")}.png'
     plt.savefig(filename, format="png", dpi=200)
-    plt.show()
+    show_or_close(fig)
 
 
 def plot_ho_count(filename, df, title):
@@ -138,17 +274,33 @@ def plot_ho_count(filename, df, title):
 
     plt.tight_layout()
     plt.savefig(f'{unidecode.unidecode(filename)}_handovers.png', format="png", dpi=200)
-    plt.show()
+    show_or_close(fig)
+
+
+@njit(cache=True, fastmath=True)
+def running_mean(values, window):
+    # Same as pd.Series.rolling(window, min_periods=1).mean(), using a running sum
+    # The values and results are float32, only the running sum is kept in float64 to avoid drift
+    out = np.empty(len(values), dtype=np.float32)
+    total = 0.0
+    for i in range(len(values)):
+        total += values[i]
+        if i >= window:
+            total -= values[i - window]
+        out[i] = total / min(i + 1, window)
+    return out
+
+
+running_mean(np.zeros(2, dtype=np.float32), 1)  # Compile on import
 
 
 def plot_metrics_over_time(scenario, rsu_config, strategy, morning=True):
-    filename = f"../results/runs/result_{scenario}_{rsu_config}_{strategy}_model_vars.csv"
-    df = pd.read_csv(filename)
+    df = _load_run_df(f"results_{scenario}_{rsu_config}", strategy)
     df = df.iloc[1:-1].reset_index(drop=True)  # Remove first and last row
 
     file_prefix = f"{scenario}_{rsu_config}_{strategy}"
 
-    colors = plt.get_cmap('tab20', 20)
+    colors = _TAB20
 
     qos_colors = {
         'MinQoS': colors(0),
@@ -159,73 +311,75 @@ def plot_metrics_over_time(scenario, rsu_config, strategy, morning=True):
         'AvgQoS_LoadBased': colors(2),
     }
 
-    def rolling(col, window=30):
-        return col.rolling(window=window, min_periods=1).mean()
-
     # Time setup
     start_time = datetime.strptime("07:15:00" if morning else "17:15:00", "%H:%M:%S")
-    experiment_start = start_time
-    experiment_end = experiment_start + timedelta(seconds=len(df) - 1)
-    times = [start_time + timedelta(seconds=i) for i in df.index]
+    times = np.datetime64(start_time, 's') + np.arange(len(df), dtype='timedelta64[s]')
 
     def setup_time_axis(ax):
         ax.xaxis.set_major_formatter(plt.matplotlib.dates.DateFormatter('%H:%M'))
         ax.xaxis.set_major_locator(plt.matplotlib.dates.MinuteLocator(byminute=[15, 30, 45, 0]))
         plt.setp(ax.get_xticklabels(), rotation=0, ha='center')
 
+    # When the plots are only saved, they are drawn one after another on the same figure.
+    # Shown plots need a figure each, since a figure is gone once its window is closed.
+    fig, ax = plt.subplots(figsize=(8, 5))
+
+    def next_plot():
+        nonlocal fig, ax
+        if INTERACTIVE:
+            show_or_close(fig)
+            fig, ax = plt.subplots(figsize=(8, 5))
+        else:
+            ax.clear()
+
     # 1. Vehicle count over time
-    plt.figure(figsize=(8, 5))
-    plt.plot(times, rolling(df['VehicleCount'], 10), label='Vehicle Count', color='tab:blue')
-    # plt.title('Number of Vehicles Over Time - 10s Smoothing')
-    plt.ylabel('Number of Vehicles')
-    plt.grid(True)
-    setup_time_axis(plt.gca())
-    plt.tight_layout()
-    plt.savefig(f"{file_prefix}_vehicle_count.png", format="png", dpi=200)
-    plt.show()
-    plt.close()
+    ax.plot(times, running_mean(df['VehicleCount'].to_numpy(np.float32), 10), label='Vehicle Count', color='tab:blue')
+    # ax.set_title('Number of Vehicles Over Time - 10s Smoothing')
+    ax.set_ylabel('Number of Vehicles')
+    ax.grid(True)
+    setup_time_axis(ax)
+    fig.tight_layout()
+    fig.savefig(f"{file_prefix}_vehicle_count.png", format="png", dpi=200)
 
     qos_roll_window = 10
 
     # 2. Min QoS and Avg QoS over time
-    plt.figure(figsize=(8, 5))
-    plt.plot(times, rolling(df['MinQoS'], qos_roll_window), label='Minimum QoS', color=qos_colors['MinQoS'])
-    plt.plot(times, rolling(df['AvgQoS'], qos_roll_window), label='Average QoS', color=qos_colors['AvgQoS'])
-    # plt.title(f'Minimum and Average QoS Over Time - {qos_roll_window}s Smoothing')
-    # plt.xlabel('Time')
-    plt.ylabel('QoS (%)')
-    plt.gca().yaxis.set_major_formatter(PercentFormatter(1, decimals=0))
-    plt.legend()
-    plt.grid(True)
-    setup_time_axis(plt.gca())
-    plt.tight_layout()
-    plt.savefig(f"{file_prefix}_min_avg_qos.png", format="png", dpi=200)
-    plt.show()
-    plt.close()
+    next_plot()
+    ax.plot(times, running_mean(df['MinQoS'].to_numpy(np.float32), qos_roll_window), label='Minimum QoS',
+            color=qos_colors['MinQoS'])
+    ax.plot(times, running_mean(df['AvgQoS'].to_numpy(np.float32), qos_roll_window), label='Average QoS',
+            color=qos_colors['AvgQoS'])
+    # ax.set_title(f'Minimum and Average QoS Over Time - {qos_roll_window}s Smoothing')
+    # ax.set_xlabel('Time')
+    ax.set_ylabel('QoS (%)')
+    ax.yaxis.set_major_formatter(_pct_formatter())
+    ax.legend()
+    ax.grid(True)
+    setup_time_axis(ax)
+    fig.tight_layout()
+    fig.savefig(f"{file_prefix}_min_avg_qos.png", format="png", dpi=200)
 
     # 3. Min Range QoS and Min Load QoS over time
-    plt.figure(figsize=(8, 5))
-    plt.plot(times, rolling(df['MinQoS_LoadBased'], qos_roll_window), label='Load-based Minimum QoS',
-             color=qos_colors['MinQoS_LoadBased'])
-    plt.plot(times, rolling(df['AvgQoS_LoadBased'], qos_roll_window), label='Load-based Average QoS',
-             color=qos_colors['AvgQoS_LoadBased'])
-    plt.plot(times, rolling(df['MinQoS_RangeBased'], qos_roll_window), label='Distance-based Minimum QoS',
-             color=qos_colors['MinQoS_RangeBased'])
-    plt.plot(times, rolling(df['AvgQoS_RangeBased'], qos_roll_window), label='Distance-based Average QoS',
-             color=qos_colors['AvgQoS_RangeBased'])
-
-    # plt.title('Worst-Case Service Quality (Min Range and Load QoS)')
-    # plt.title(f'QoS Over Time - Load-based vs Distance-based - {qos_roll_window}s Smoothing')
-    # plt.xlabel('Time')
-    plt.ylabel('QoS (%)')
-    plt.gca().yaxis.set_major_formatter(PercentFormatter(1, decimals=0))
-    plt.legend()
-    plt.grid(True)
-    setup_time_axis(plt.gca())
-    plt.tight_layout()
-    plt.savefig(f"{file_prefix}_min_range_load_qos.png", format="png", dpi=200)
-    plt.show()
-    plt.close()
+    next_plot()
+    ax.plot(times, running_mean(df['MinQoS_LoadBased'].to_numpy(np.float32), qos_roll_window),
+            label='Load-based Minimum QoS', color=qos_colors['MinQoS_LoadBased'])
+    ax.plot(times, running_mean(df['AvgQoS_LoadBased'].to_numpy(np.float32), qos_roll_window),
+            label='Load-based Average QoS', color=qos_colors['AvgQoS_LoadBased'])
+    ax.plot(times, running_mean(df['MinQoS_RangeBased'].to_numpy(np.float32), qos_roll_window),
+            label='Distance-based Minimum QoS', color=qos_colors['MinQoS_RangeBased'])
+    ax.plot(times, running_mean(df['AvgQoS_RangeBased'].to_numpy(np.float32), qos_roll_window),
+            label='Distance-based Average QoS', color=qos_colors['AvgQoS_RangeBased'])
+
+    # ax.set_title('Worst-Case Service Quality (Min Range and Load QoS)')
+    # ax.set_title(f'QoS Over Time - Load-based vs Distance-based - {qos_roll_window}s Smoothing')
+    # ax.set_xlabel('Time')
+    ax.set_ylabel('QoS (%)')
+    ax.yaxis.set_major_formatter(_pct_formatter())
+    ax.legend()
+    ax.grid(True)
+    setup_time_axis(ax)
+    fig.tight_layout()
+    fig.savefig(f"{file_prefix}_min_range_load_qos.png", format="png", dpi=200)
 
     # 4. Avg Range QoS and Avg Load QoS over time
     # plt.figure(figsize=(8, 5))
@@ -246,19 +400,17 @@ def plot_metrics_over_time(scenario, rsu_config, strategy, morning=True):
 
     # 5. Gini Load over time
     smoothing_window = 30
-    smoothed_gini = rolling(df['GiniLoad'], 30)
-
-    plt.figure(figsize=(8, 5))
-    plt.plot(times, smoothed_gini, label='Gini Load', color='tab:cyan')
-    # plt.title('Load Distribution Inequality (Gini Coefficient) - 30s Smoothing')
-    # plt.xlabel('Time')
-    plt.ylabel('Gini Coefficient')
-    plt.grid(True)
-    setup_time_axis(plt.gca())
-    plt.tight_layout()
-    plt.savefig(f"{file_prefix}_gini_load.png", format="png", dpi=200)
-    plt.show()
-    plt.close()
+    smoothed_gini = running_mean(df['GiniLoad'].to_numpy(np.float32), 30)
+
+    next_plot()
+    ax.plot(times, smoothed_gini, label='Gini Load', color='tab:cyan')
+    # ax.set_title('Load Distribution Inequality (Gini Coefficient) - 30s Smoothing')
+    # ax.set_xlabel('Time')
+    ax.set_ylabel('Gini Coefficient')
+    ax.grid(True)
+    setup_time_axis(ax)
+    fig.tight_layout()
+    fig.savefig(f"{file_prefix}_gini_load.png", format="png", dpi=200)
 
     # 6. Successful HO and Failed HO over time using 2 y-axes
     # plt.figure(figsize=(8, 5))
@@ -283,8 +435,14 @@ def plot_metrics_over_time(scenario, rsu_config, strategy, morning=True):
     # plt.show()
     # plt.close()
 
+    show_or_close(fig)
+
 
 def plot_rsu_config(rsu_config: list[RsuConfig], name: str):
+    # Imported here, since they load the simulation code, which the other plots do not need
+    from poc.VanetTraceLoader import get_grid
+    from poc.render import VEC_STATION_COLORS
+
     background = get_grid()
 
     fig, ax = plt.subplots(figsize=(5, 5))
@@ -307,7 +465,7 @@ def plot_rsu_config(rsu_config: list[RsuConfig], name: str):
     fig.tight_layout()
     filename = f'rsu_config_{name}.png'
     fig.savefig(filename, format='png', dpi=200, transparent=True)
-    plt.show()
+    show_or_close(fig)
 
 
 # Example configurations for Sparse and Dense scenarios
@@ -351,11 +509,9 @@ results_tradition_vs_base = [
 
 def plot_total_ho_frequency(configs, title, field):
     # Prepare data
-    data = []
-    for filename, res_title in configs:
-        df = pd.read_csv(f"../results/{filename}.csv")
-        df = df.sort_values(by='Model', key=lambda x: x.map(custom_sort_key))
-        data.append((filename, df, res_title))
+    data = _load_all_results(configs)
+    # Sum the field per model in one grouped pass per file, instead of one scan per model
+    model_sums = {filename: df.groupby('Model', observed=True)[field].sum().to_dict() for filename, df, _ in data}
 
     # Extract total handover frequency data
     ho_data_2 = []
@@ -368,7 +524,7 @@ def plot_total_ho_frequency(configs, title, field):
 
     for filename, df, res_title in data:
         group_names.append(res_title)
-        ho_data_2.append([df[df['Model'] == model][field].sum() for model in arhc])
+        ho_data_2.append([model_sums[filename].get(model, 0) for model in arhc])
         is_sparse = '4' in filename
         if is_sparse and done['sparse']:
             continue
@@ -377,20 +533,21 @@ def plot_total_ho_frequency(configs, title, field):
 
         done['sparse' if is_sparse else 'dense'] = True
         # group_names.append("Sparse" if is_sparse else "Dense")
-        ho_data_2.append([df[df['Model'] == model][field].sum() for model in traditional])
+        ho_data_2.append([model_sums[filename].get(model, 0) for model in traditional])
 
+    ho_data_2 = np.asarray(ho_data_2, dtype=np.int64)
     # Swap entry 1 and 2
-    ho_data_2[1], ho_data_2[2] = ho_data_2[2], ho_data_2[1]
+    ho_data_2[[1, 2]] = ho_data_2[[2, 1]]
     # Swap entry 4 and 5_2_2_2
-    ho_data_2[4], ho_data_2[5] = ho_data_2[5], ho_data_2[4]
+    ho_data_2[[4, 5]] = ho_data_2[[5, 4]]
     # Swap entry 5 and 6_2_2_2
-    ho_data_2[5], ho_data_2[6] = ho_data_2[6], ho_data_2[5]
+    ho_data_2[[5, 6]] = ho_data_2[[6, 5]]
 
-    ho_data = list(map(list, zip(*ho_data_2)))
+    ho_data = ho_data_2.T
 
     # Determine if a break is needed
     break_threshold = 20000
-    max_value = max(max(x) for x in ho_data)
+    max_value = ho_data.max()
     needs_break = max_value > break_threshold
 
     # w = 3 * len(configs)
@@ -409,7 +566,7 @@ def plot_total_ho_frequency(configs, title, field):
     index = np.array([0, 1, 2, 3 + offset, 4 + offset, 5 + offset, 6 + offset]) * (
             len(ho_data) * bar_width + gap_width)  # Add space between groups
 
-    colors = plt.get_cmap('Set1', 6)
+    colors = _SET1_6
 
     for i, counts in enumerate(ho_data):
         color = [colors(i) for _ in range(5)]
@@ -468,30 +625,23 @@ def plot_total_ho_frequency(configs, title, field):
     plt.tight_layout()
     plt.savefig(f'{unidecode.unidecode(title).strip().lower().replace(" ", "_")}.png',
                 format="png", dpi=200, transparent=True)
-    plt.show()
+    show_or_close(fig)
 
 
 def plot_boxplot(configs, y_axis, field, title, percentage=False):
     # Prepare data
-    data = []
-    for filename, res_title in configs:
-        df = pd.read_csv(f"../results/{filename}.csv")
-        df = df.sort_values(by='Model', key=lambda x: x.map(custom_sort_key))
-        data.append((filename, df, res_title))
+    data = _load_all_results(configs)
 
     # Extract total handover frequency data
+    _preload_runs(data)
     qos_data = {}
     for filename, df, res_title in data:
         for model in df['Model'].unique():
-            if model.startswith('ARHC-') and model not in ['ARHC-Oracle', 'ARHC-10s', 'ARHC-20s']:
+            if not _is_boxplot_model(model):
                 continue
             if model not in qos_data:
                 qos_data[model] = []
-            details_file = f"../results/runs/{filename.replace('results', 'result')}_{model.lower()}_model_vars.csv"
-            # Read using pands and extract column MinQos
-            df = pd.read_csv(details_file)
-            qos_values = df[field][1:-1]  # Ignore first and last due to outliers (no vehicles)
-            qos_data[model].append(qos_values)
+            qos_data[model].append(_load_run(filename, model, field))
 
     fig, ax = plt.subplots(figsize=(12, 8))
 
@@ -524,7 +674,10 @@ def plot_boxplot(configs, y_axis, field, title, percentage=False):
                    medianprops=dict(color='black'), whiskerprops=dict(color='black'), capprops=dict(color='black'),
                    flierprops=dict(marker='o', color='gray', alpha=0.4, markersize=2),
                    whis=[1, 99])  # Set lower whisker to 9th percentile and upper whisker to 91st percentile
-        averages = [np.mean(c) for c in counts]
+        if len({len(c) for c in counts}) == 1:
+            averages = np.vstack(counts).mean(axis=1, dtype=np.float64)
+        else:
+            averages = np.fromiter((c.mean(dtype=np.float64) for c in counts), dtype=np.float64, count=len(counts))
         ax.scatter(positions, averages, color=color, edgecolors='black', linewidths=1, s=180, zorder=3, label='Average' if i == 0 else "", marker='D')
         legend_labels.append(model)
         legend_colors.append(color)
@@ -535,7 +688,7 @@ def plot_boxplot(configs, y_axis, field, title, percentage=False):
     ax.set_xlabel('Configurations', fontsize=14)
     ax.set_ylabel(y_axis, fontsize=14)
     if percentage:
-        plt.gca().yaxis.set_major_formatter(plt.FuncFormatter(lambda x, _: f'{x:.0%}'))
+        plt.gca().yaxis.set_major_formatter(_pct_formatter())
     ax.set_xticks(index + bar_width * (len(qos_data) - 1) / 2)
     ax.set_xticklabels([res_title for _, _, res_title in data], rotation=0, ha='center', fontsize=12)
     legend_pos = "lower left" if field == "MinQoS" else "upper left"
@@ -549,30 +702,23 @@ def plot_boxplot(configs, y_axis, field, title, percentage=False):
     plt.tight_layout()
     plt.savefig(f'{unidecode.unidecode(y_axis).strip().lower().replace(" ", "_")}.png',
                 format="png", dpi=200, transparent=True)
-    plt.show()
+    show_or_close(fig)
 
 
 def plot_boxplot_gini(configs, y_axis, field, title, percentage=False):
     # Prepare data
-    data = []
-    for filename, res_title in configs:
-        df = pd.read_csv(f"../results/{filename}.csv")
-        df = df.sort_values(by='Model', key=lambda x: x.map(custom_sort_key))
-        data.append((filename, df, res_title))
+    data = _load_all_results(configs)
 
     # Extract total handover frequency data
+    _preload_runs(data)
     qos_data = {}
     for filename, df, res_title in data:
         for model in df['Model'].unique():
-            if model.startswith('ARHC-') and model not in ['ARHC-Oracle', 'ARHC-10s', 'ARHC-20s']:
+            if not _is_boxplot_model(model):
                 continue
             if model not in qos_data:
                 qos_data[model] = []
-            details_file = f"../results/runs/{filename.replace('results', 'result')}_{model.lower()}_model_vars.csv"
-            # Read using pands and extract column MinQos
-            df = pd.read_csv(details_file)
-            qos_values = df[field][1:-1]  # Ignore first and last due to outliers (no vehicles)
-            qos_data[model].append(qos_values)
+            qos_data[model].append(_load_run(filename, model, field))
 
     ho_data_2 = []
 
@@ -586,10 +732,7 @@ def plot_boxplot_gini(configs, y_axis, field, title, percentage=False):
         group_names.append(res_title)
         ho_data_2.append([])
         for model in arhc:
-            details_file = f"../results/runs/{filename.replace('results', 'result')}_{model.lower()}_model_vars.csv"
-            df = pd.read_csv(details_file)
-            qos_values = df[field][1:-1]  # Ignore first and last due to outliers (no vehicles)
-            ho_data_2[-1].append(qos_values)
+            ho_data_2[-1].append(_load_run(filename, model, field))
         is_sparse = '4' in filename
         if is_sparse and done['sparse']:
             continue
@@ -598,10 +741,7 @@ def plot_boxplot_gini(configs, y_axis, field, title, percentage=False):
 
         ho_data_2.append([])
         for model in traditional:
-            details_file = f"../results/runs/{filename.replace('results', 'result')}_{model.lower()}_model_vars.csv"
-            df = pd.read_csv(details_file)
-            qos_values = df[field][1:-1]
-            ho_data_2[-1].append(qos_values)
+            ho_data_2[-1].append(_load_run(filename, model, field))
 
         done['sparse' if is_sparse else 'dense'] = True
         # group_names.append("Sparse" if is_sparse else "Dense")
@@ -629,28 +769,35 @@ def plot_boxplot_gini(configs, y_axis, field, title, percentage=False):
     base_arr[offset_from:] += offset
     index = base_arr * (len(qos_data) * bar_width + large_gap_width)  # Add space between groups
 
-    colors = plt.get_cmap('Set1', 6)
+    colors = _SET1_6
     legend_colors = []
 
+    box_values, box_positions, box_colors = [], [], []
     for i, counts in enumerate(qos_data):
         positions = index + (i - 1) * bar_width
         color = [colors(i) for _ in range(5)]
         color.insert(2, colors(i + 3))
         color.append(colors(i + 3))
-        for val, pos, col in zip(counts, positions, color):
-            ax.boxplot([val], positions=[pos], widths=bar_width - margin, patch_artist=True,
-                       boxprops=dict(facecolor=col),
-                       medianprops=dict(color='black'), whiskerprops=dict(color='black'), capprops=dict(color='black'),
-                       flierprops=dict(marker='o', color='gray', alpha=0.4, markersize=2))
+        box_values.extend(counts)
+        box_positions.extend(positions)
+        box_colors.extend(color)
         legend_colors.append(color)
 
+    # Draw all boxes at once and color them afterward
+    boxplot = ax.boxplot(box_values, positions=box_positions, widths=bar_width - margin, patch_artist=True,
+                         medianprops=dict(color='black'), whiskerprops=dict(color='black'),
+                         capprops=dict(color='black'),
+                         flierprops=dict(marker='o', color='gray', alpha=0.4, markersize=2))
+    for box, color in zip(boxplot['boxes'], box_colors):
+        box.set_facecolor(color)
+
     vertical_line_position = offset_from - 1 + 0.08
     ax.axvline(x=vertical_line_position, color='gray', linestyle='--')
 
     ax.set_xlabel('Configurations', fontsize=14)
     ax.set_ylabel(y_axis, fontsize=14)
     if percentage:
-        plt.gca().yaxis.set_major_formatter(plt.FuncFormatter(lambda x, _: f'{x:.0%}'))
+        plt.gca().yaxis.set_major_formatter(_pct_formatter())
     ax.set_xticks(index)
     x_labels = [res_title for _, _, res_title in data]
     x_labels.insert(2, "Sparse\n(cap. indep.)")
@@ -667,11 +814,15 @@ def plot_boxplot_gini(configs, y_axis, field, title, percentage=False):
     plt.tight_layout()
     plt.savefig(f'{unidecode.unidecode(y_axis).strip().lower().replace(" ", "_")}.png',
                 format="png", dpi=200, transparent=True)
-    plt.show()
+    show_or_close(fig)
 
 
 # Main function to visualize results
 def main():
+    if not INTERACTIVE:
+        # No figure exists yet, so the backend can still be switched after importing pyplot
+        matplotlib.use('Agg')
+
     # visualize_results(results_creteil_sparse, "Créteil Sparse")
     # visualize_results(results_creteil_dense, "Créteil Dense")
     # visualize_results(results_creteil_dense_vs_sparse, "Créteil Morning Sparse vs Dense", plot_ho=False)
@@ -684,6 +835,8 @@ def main():
     # plot_metrics_over_time("creteil-morning", "3-fail-full", "arhc-01s", morning=True)
     # plot_metrics_over_time("creteil-morning", "3-fail-half", "arhc-01s", morning=True)
 
+    # from poc.scenarios import CRETEIL_4_RSU_FULL_CAPA_CONFIG, CRETEIL_9_RSU_FULL_CAPA_CONFIG, \
+    #     CRETEIL_3_FAIL_RSU_FULL_CAPA_CONFIG
     # plot_rsu_config(CRETEIL_4_RSU_FULL_CAPA_CONFIG, "creteil_4")
     # plot_rsu_config(CRETEIL_9_RSU_FULL_CAPA_CONFIG, "creteil_9")
     # plot_rsu_config(CRETEIL_3_FAIL_RSU_FULL_CAPA_CONFIG, "creteil_3_fail")
@@ -697,12 +850,14 @@ def main():
         ("results_creteil-morning_9-half", "Dense NW\nHalf" + cap_suffix),
         ("results_creteil-morning_9-quarter", "Dense NW\nQuarter" + cap_suffix),
     ], "ho", "HO_Total")
+    gc.collect()
 
     plot_boxplot([
         ("results_creteil-morning_4-half", "Sparse NW\nHalf" + cap_suffix),
         ("results_creteil-morning_9-half", "Dense NW\nHalf" + cap_suffix),
         ("results_creteil-morning_9-quarter", "Dense NW\nQuarter" + cap_suffix),
     ], "Minimum QoS", "MinQoS", "Minimum QoS per Configuration", percentage=True)
+    gc.collect()
 
     plot_boxplot_gini([
         ("results_creteil-morning_4-full", "Sparse NW\nFull" + cap_suffix),